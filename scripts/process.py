@@ -4,7 +4,7 @@ Process a series of SAXS images using the SeriesProcessor pipeline (script versi
 
 import logging
 from pathlib import Path
-import fabio
+import tifffile
 from saxs_decosmic.core.series_processor import SeriesProcessor, SeriesConfig
 
 # Parameters
@@ -13,6 +13,7 @@ OUTPUT_DIR = "data/processed"             # Output directory
 OUTPUT_PREFIX = "test"                    # Output file prefix
 USER_MASK = None                          # Path to user mask file (optional)
 USE_FABIO = False                         # Use fabio for image loading
+OUTPUT_FLOAT_DTYPE = None                 # Type for floating-point outputs, e.g. "float32" to halve their size (None keeps float64)
 
 TH_DONUT = 15
 TH_MASK = 0.05
@@ -42,7 +43,11 @@ if USER_MASK:
     if not mask_path.exists() or not mask_path.is_file():
         logger.error(f"User mask file not found: {USER_MASK}")
         exit(1)
-    user_mask = fabio.open(str(mask_path)).data.astype(bool)
+    if mask_path.suffix.lower() in ('.tif', '.tiff'):
+        user_mask = tifffile.imread(mask_path) != 0
+    else:
+        import fabio
+        user_mask = fabio.open(str(mask_path)).data != 0
 
 # Processing configuration
 series_config = SeriesConfig(
@@ -69,5 +74,5 @@ series_result = processor.process_series()
 
 # Save results
 logger.info(f"Saving results to: {output_path} (prefix: {OUTPUT_PREFIX})")
-series_result.save(str(output_path), OUTPUT_PREFIX)
+series_result.save(str(output_path), OUTPUT_PREFIX, OUTPUT_FLOAT_DTYPE)
 logger.info("Processing complete.") 
\ No newline at end of file
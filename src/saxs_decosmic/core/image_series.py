@@ -1,11 +1,41 @@
 """Module for handling image series loading and management using different implementations."""
-import fabio
 from pathlib import Path
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextlib
+import fnmatch
+import hashlib
+import mmap
+from functools import cached_property, lru_cache
 import os
+import threading
+from typing import Any, Callable, Iterator, NamedTuple, Sequence, Tuple
 import numpy as np
 import tifffile
 
+# Directory Scanning
+
+def _scan(directory: str, pattern: str) -> Tuple[str, ...]:
+    """List the sorted names of the files matching a pattern in a directory in a single directory listing.
+
+    Not cached across calls: directory mtimes are too coarse (or attribute-cached on network filesystems)
+    to notice frames written during a live acquisition.
+    """
+    with os.scandir(directory) as entries:
+        return tuple(sorted(entry.name for entry in entries if fnmatch.fnmatch(entry.name, pattern) and entry.is_file()))
+
+# Shared Decoding Threads
+
+@lru_cache(maxsize=1)
+def _decode_pool() -> ThreadPoolExecutor:
+    """Get the thread pool shared by all series for decoding compressed files concurrently."""
+    return ThreadPoolExecutor(max_workers=os.cpu_count() or 4, thread_name_prefix='saxs-decosmic-decode')
+
+# A forked child has none of the parent's threads, so it starts its own pool (there is no fork on Windows)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_decode_pool.cache_clear)
+
 # Base Image Series Class
 
 class BaseImageSeries(ABC):
@@ -15,6 +45,40 @@ class BaseImageSeries(ABC):
     def get_frame(self, index: int) -> np.ndarray:
         """Get a frame at the specified index."""
         pass
+
+    def get_frames(self, indices: Sequence[int], out: np.ndarray | None = None) -> np.ndarray:
+        """Get a stack of the frames at the specified indices, read into out if given or a newly allocated array otherwise."""
+        get_frame = self.get_frame
+        for k, index in enumerate(indices):
+            frame = get_frame(index)
+            if out is None:
+                out = np.empty((len(indices), *frame.shape), dtype=frame.dtype)
+            np.copyto(out[k], frame)
+        return out
+
+    @cached_property
+    def _first_frame_info(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Read the first frame once to get the frame shape and dtype."""
+        frame = self.get_frame(0)
+        return frame.shape, frame.dtype
+
+    @property
+    def frame_shape(self) -> Tuple[int, ...]:
+        """Get the shape of a frame, probed once from the first frame."""
+        return self._first_frame_info[0]
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Get the dtype of the frames, probed once from the first frame."""
+        return self._first_frame_info[1]
+
+    def frame_source(self, index: int) -> Tuple[str, int] | None:
+        """Get the file holding the frame at the specified index and the frame's position in it, or None if unknown."""
+        return None
+
+    def as_array(self) -> 'LazyStack':
+        """Get a lazy (nframes, H, W) array view of the series that reads frames only when indexed or converted."""
+        return LazyStack(self)
     
     @property
     @abstractmethod
@@ -27,6 +91,61 @@ class BaseImageSeries(ABC):
         """Clean up any resources held by the implementation."""
         pass
 
+class LazyStack:
+    """Array-like view of an image series as a (nframes, H, W) stack that reads frames on demand.
+
+    Indexing along the frame axis reads only the selected frames; np.asarray reads the whole series.
+    """
+
+    def __init__(self, img_series: BaseImageSeries) -> None:
+        """Initialize the view over an image series."""
+        self.img_series = img_series
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """Get the shape of the stack."""
+        return (self.img_series.nframes, *self.img_series.frame_shape)
+
+    @property
+    def dtype(self) -> np.dtype:
+        """Get the dtype of the frames."""
+        return self.img_series.dtype
+
+    @property
+    def ndim(self) -> int:
+        """Get the number of dimensions of the stack."""
+        return len(self.shape)
+
+    def __len__(self) -> int:
+        """Get the number of frames."""
+        return self.img_series.nframes
+
+    def __getitem__(self, key: Any) -> np.ndarray:
+        """Read the frames selected by the first index and apply the remaining indices to them."""
+        key = key if isinstance(key, tuple) else (key,)
+        if any(item is None for item in key):
+            raise IndexError("A lazy image stack cannot insert new axes (None/np.newaxis)")
+        if key and key[0] is Ellipsis:
+            # Expand a leading Ellipsis so that the first index still selects frames
+            key = (slice(None),) * max(self.ndim - len(key) + 1, 0) + key[1:]
+        index, rest = (key[0], key[1:]) if key else (slice(None), ())
+        if isinstance(index, (int, np.integer)):
+            frame = self.img_series.get_frame(range(len(self))[index])
+            return frame[rest]
+        if isinstance(index, slice):
+            indices = range(len(self))[index]
+        else:
+            indices = np.arange(len(self))[index].tolist()
+        out = np.empty((len(indices), *self.shape[1:]), dtype=self.dtype)
+        return self.img_series.get_frames(indices, out=out)[(slice(None), *rest)]
+
+    def __array__(self, dtype: np.dtype | None = None, copy: bool | None = None) -> np.ndarray:
+        """Read the whole series into an array."""
+        if copy is False:
+            raise ValueError("A lazy image stack cannot be converted to an array without reading the frames")
+        stack = self[:]
+        return stack if dtype is None else stack.astype(dtype, copy=False)
+
 # Image Series Implementations
 
 class ManualImageSeries(BaseImageSeries):
@@ -36,58 +155,472 @@ class ManualImageSeries(BaseImageSeries):
         """Initialize the image series implementation."""
         self.directory = Path(directory)
         self.extension = extension
+        self.mappable: bool | None = None # Whether the files can be memory-mapped, known after the first read
         self._load_files()
         
     def _load_files(self) -> None:
         """Load and sort image files from the directory."""
-        # Get all matching files and sort them
-        self.files = sorted(self.directory.glob(self.extension))
+        # Get all matching files in one directory listing
+        directory = str(self.directory)
+        names = _scan(directory, self.extension)
+        self.files = [os.path.join(directory, name) for name in names]
         if not self.files:
             raise ValueError(f"No files matching extension '{self.extension}' found in {self.directory}")
+        self._nframes = len(self.files)
         
     @property
     def nframes(self) -> int:
         """Get the number of frames in the series."""
-        return len(self.files)
+        return self._nframes
     
+    def _path(self, index: int) -> str:
+        """Get the path of the file holding the frame at the specified index."""
+        if not 0 <= index < self._nframes:
+            raise IndexError(f"Frame index {index} out of range [0, {self._nframes})")
+        return self.files[index]
+
+    def frame_source(self, index: int) -> Tuple[str, int] | None:
+        """Get the file holding the frame at the specified index and the frame's position in it."""
+        return self._path(index), 0
+
     def get_frame(self, index: int) -> np.ndarray:
-        """Get a frame at the specified index."""
-        if not 0 <= index < self.nframes:
-            raise IndexError(f"Frame index {index} out of range [0, {self.nframes})")
-        
-        return tifffile.imread(str(self.files[index]))
+        """Get a frame at the specified index.
+
+        Uncompressed TIFFs are returned as read-only memory maps of the file; copy the frame before modifying it.
+        """
+        path = self._path(index)
+        if self.mappable is False:
+            return tifffile.imread(path)
+        try:
+            frame = tifffile.memmap(path, mode='r')
+        except ValueError: # Compressed or otherwise not contiguous on disk
+            self.mappable = False
+            return tifffile.imread(path)
+        self.mappable = True
+        if not frame.dtype.isnative:
+            return frame.astype(frame.dtype.newbyteorder('='))
+        return frame
+
+    def get_frames(self, indices: Sequence[int], out: np.ndarray | None = None) -> np.ndarray:
+        """Get a stack of the frames at the specified indices, read into out if given or a newly allocated array otherwise.
+
+        Compressed files are decoded concurrently in a shared thread pool, as the decoders release the GIL.
+        """
+        if self.mappable is not False or len(indices) < 2:
+            return super().get_frames(indices, out)
+        if out is None:
+            out = np.empty((len(indices), *self.frame_shape), dtype=self.dtype)
+
+        def read(k: int, index: int) -> None:
+            tifffile.imread(self._path(index), out=out[k]) # Decoded in place, without an intermediate frame
+
+        for _ in _decode_pool().map(read, range(len(indices)), indices):
+            pass
+        return out
 
     def cleanup(self) -> None:
         """Clean up any resources held by the implementation."""
         pass
 
+class StackedMemmapImageSeries(BaseImageSeries):
+    """Implementation for a series stored as one uncompressed multi-page TIFF, memory-mapped as a single (nframes, H, W) array."""
+
+    def __init__(self, filename: str) -> None:
+        """Initialize the image series implementation, raising ValueError if the file is not a mappable stack of 2-D frames."""
+        self.filename = filename
+        with tifffile.TiffFile(filename) as tif:
+            series = tif.series[0]
+            if len(tif.pages) < 2 or len(series.shape) != 3 or series.shape[0] != len(tif.pages):
+                raise ValueError(f"{filename} is not a multi-page stack of 2-D frames")
+            if series.dataoffset is None:
+                raise ValueError(f"{filename} is not memory-mappable")
+            dtype = np.dtype(tif.byteorder + series.dtype.char)
+        self.stack = np.memmap(filename, dtype=dtype, mode='r', offset=series.dataoffset, shape=series.shape)
+        self.dataoffset = series.dataoffset
+        # Kept open only to hint the kernel about upcoming reads of the mapped file
+        self.fd = os.open(filename, os.O_RDONLY) if hasattr(os, 'posix_fadvise') else None
+        # Indexed through a plain ndarray view to skip np.memmap's Python-level indexing hooks
+        self.frames = self.stack.view(np.ndarray)
+        self._first_frame_info = (series.shape[1:], dtype.newbyteorder('='))
+        self._nframes = series.shape[0]
+        self._reader = self._make_reader(self.frames, self.dtype)
+
+    @staticmethod
+    def _make_reader(frames: np.ndarray, dtype: np.dtype) -> Callable[[int], np.ndarray]:
+        """Build a function reading a frame by a valid index, with the mapped frames and their byte order fixed at series-open time."""
+        if frames.dtype.isnative:
+            return frames.__getitem__
+        return lambda index: frames[index].astype(dtype)
+
+    @property
+    def nframes(self) -> int:
+        """Get the number of frames in the series."""
+        return self._nframes
+
+    def frame_source(self, index: int) -> Tuple[str, int] | None:
+        """Get the file holding the frame at the specified index and the frame's position in it."""
+        if not 0 <= index < self._nframes:
+            raise IndexError(f"Frame index {index} out of range [0, {self._nframes})")
+        return self.filename, index
+
+    def get_frame(self, index: int) -> np.ndarray:
+        """Get a frame at the specified index as a read-only view of the mapped file (converted if not in native byte order)."""
+        if not 0 <= index < self._nframes:
+            raise IndexError(f"Frame index {index} out of range [0, {self._nframes})")
+        return self._reader(index)
+
+    def get_frames(self, indices: Sequence[int], out: np.ndarray | None = None) -> np.ndarray:
+        """Get a stack of the frames at the specified indices, read into out if given or a newly allocated array otherwise."""
+        if isinstance(indices, range) and indices.step == 1:
+            # Have the kernel start reading this range and the next one of the same length in large requests
+            self._will_need(indices.start, indices.stop + len(indices))
+            frames = self.frames[indices.start:indices.stop]
+        else:
+            frames = self.frames[list(indices)]
+        if out is None:
+            return np.array(frames, dtype=self.dtype)
+        np.copyto(out, frames)
+        return out
+
+    def _will_need(self, start: int, stop: int) -> None:
+        """Advise the kernel that the frames in [start, stop) will be read soon, if supported."""
+        if self.fd is None:
+            return
+        stop = min(stop, self.nframes)
+        if start >= stop:
+            return
+        frame_bytes = self.frames[0].nbytes
+        os.posix_fadvise(self.fd, self.dataoffset + start * frame_bytes, (stop - start) * frame_bytes, os.POSIX_FADV_WILLNEED)
+
+    def cleanup(self) -> None:
+        """Clean up any resources held by the implementation."""
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
 class FabioImageSeries(BaseImageSeries):
     """Implementation for loading images using fabio's built-in series loading functionality."""
     
     def __init__(self, first_filename: str) -> None:
         """Initialize the image series implementation."""
-        self.img_series = fabio.open_series(first_filename=first_filename)
+        import fabio # Imported lazily since fabio loads all of its format backends on import
+        self.files = self._list_files(first_filename)
+        self.positions = {filename: k for k, filename in enumerate(self.files)}
+        self.img_series = fabio.open_series(filenames=self.files)
+        self._nframes = self.img_series.nframes # Opens every file once to count its frames
+        self.frames: Iterator[Any] | None = None # Sequential frame iterator
+        self.cursor = 0 # Index of the next frame the iterator yields
+
+    @staticmethod
+    def _list_files(first_filename: str) -> list[str]:
+        """List the files of the series by following fabio's file numbering from the first file up to the first missing one."""
+        from fabio.file_series import filename_series
+        if not os.path.isfile(first_filename):
+            return []
+        files = [first_filename]
+        try:
+            names = filename_series(first_filename)
+            name = names.next()
+            while os.path.isfile(name):
+                files.append(name)
+                name = names.next()
+        except TypeError: # Filename without a frame number, so a series of one file
+            pass
+        return files
+    
+    def frame_source(self, index: int) -> Tuple[str, int] | None:
+        """Get the file holding the frame at the specified index and the frame's position in it, or None for multi-frame files."""
+        if len(self.files) != self._nframes or not 0 <= index < self._nframes:
+            return None
+        return self.files[index], 0
+
+    def _iter_frames(self, start: int) -> Iterator[Any]:
+        """Iterate over the fabio frames from the start index on, opening each file of the series once."""
+        import fabio
+        frame = self.img_series.get_frame(start) # Raises IndexError itself for frames outside the series
+        yield frame
+        image = frame.file_container # Kept open by the series until its next random access
+        for k in range(frame.file_index + 1, image.nframes):
+            yield image.get_frame(k)
+        for filename in self.files[self.positions[image.filename] + 1:]:
+            with fabio.open(filename) as image:
+                for k in range(image.nframes):
+                    yield image.get_frame(k)
+    
+    def _read(self, index: int) -> Any:
+        """Read a fabio frame, continuing the sequential iteration when the index follows the previous read and restarting it at the index otherwise.
+
+        fabio's random access looks up the file of a frame by scanning its list of files, which is quadratic over a whole series,
+        so it only locates the first frame of each iteration.
+        """
+        if self.frames is not None and index == self.cursor:
+            frame = next(self.frames, None)
+            if frame is not None:
+                self.cursor += 1
+                return frame
+        if self.frames is not None:
+            self.frames.close()
+        self.frames = self._iter_frames(index)
+        frame = next(self.frames)
+        self.cursor = index + 1
+        return frame
     
     @property
     def nframes(self) -> int:
         """Get the number of frames in the series."""
-        return self.img_series.nframes
+        return self._nframes
     
     def get_frame(self, index: int) -> np.ndarray:
-        """Get a frame at the specified index."""
+        """Get a frame at the specified index.
+
+        The frame is a read-only view of fabio's pixel array; copy it before modifying it.
+        fabio raises IndexError itself for frames outside the series.
+        """
+        data = getattr(self._read(index), 'data', None)
+        if data is None:
+            raise IndexError(f"Frame {index} has no data")
+        data = np.asarray(data).view()
+        data.setflags(write=False)
+        return data
+
+    def cleanup(self) -> None:
+        """Clean up any resources held by the implementation."""
+        if getattr(self, 'frames', None) is not None:
+            self.frames.close()
+            self.frames = None
+        if hasattr(self, 'img_series'):
+            self.img_series.close()
+
+class PrefetchingImageSeries(BaseImageSeries):
+    """Wrapper that reads the frames following the requested one ahead of time in a thread pool.
+
+    All reads of the wrapped series go through the pool, so a single worker keeps them serialized
+    for series that are not safe to read from several threads.
+    """
+
+    def __init__(self, img_series: BaseImageSeries, prefetch: int, max_workers: int = 4) -> None:
+        """Initialize the wrapper around an image series with the number of frames to read ahead."""
+        self.img_series = img_series
+        self.prefetch = prefetch
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='saxs-decosmic-prefetch')
+        self.futures: dict[int, Future] = {}
+
+    @property
+    def _first_frame_info(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Get the frame shape and dtype of the wrapped series."""
+        return self.img_series._first_frame_info
+
+    @property
+    def nframes(self) -> int:
+        """Get the number of frames in the series."""
+        return self.img_series.nframes
+
+    def frame_source(self, index: int) -> Tuple[str, int] | None:
+        """Get the file holding the frame at the specified index and the frame's position in it, as known by the wrapped series."""
+        return self.img_series.frame_source(index)
+
+    def get_frame(self, index: int) -> np.ndarray:
+        """Get a frame at the specified index and schedule reads of the frames after it."""
+        if not 0 <= index < self.nframes:
+            raise IndexError(f"Frame index {index} out of range [0, {self.nframes})")
+
+        future = self.futures.pop(index, None) or self.executor.submit(self.img_series.get_frame, index)
+        for stale in [ahead for ahead in self.futures if not index < ahead <= index + self.prefetch]:
+            self.futures.pop(stale).cancel()
+        for ahead in range(index + 1, min(index + self.prefetch + 1, self.nframes)):
+            if ahead not in self.futures:
+                self.futures[ahead] = self.executor.submit(self.img_series.get_frame, ahead)
+        return future.result()
+
+    def cleanup(self) -> None:
+        """Clean up any resources held by the implementation."""
+        if hasattr(self, 'executor'):
+            for future in self.futures.values():
+                future.cancel()
+            self.futures.clear()
+            self.executor.shutdown(wait=True)
+            self.img_series.cleanup()
+
+class CacheInfo(NamedTuple):
+    """Statistics of a CachedImageSeries."""
+    hits: int
+    misses: int
+    nframes: int
+    nbytes: int
+    max_bytes: int
+    disk_hits: int
+
+def _is_mapped(frame: np.ndarray) -> bool:
+    """Check whether an array is backed by a memory-mapped file, following its chain of bases."""
+    base = frame
+    while base is not None:
+        if isinstance(base, (np.memmap, mmap.mmap)):
+            return True
+        base = getattr(base, 'base', None)
+    return False
+
+def _default_cache_bytes() -> int:
+    """Get the default frame cache budget of 5% of the available memory, or 1 GiB where that is unknown."""
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 20
+    except (AttributeError, ValueError, OSError):
+        return 1 << 30
+
+class CachedImageSeries(BaseImageSeries):
+    """Wrapper that keeps recently read frames of another image series in a least-recently-used cache with a byte budget.
+
+    With a disk_dir, frames missing from memory are also spilled there as .npy files in the background
+    and memory-mapped back on later misses, so slow-to-decode frames are decoded once across runs.
+    Each spilled frame is keyed on its own source file (path, modification time and size) and its position
+    in that file, taken once per file when its first frame is read, so a file rewritten since is decoded again
+    on the next run; frames without a known source are not spilled.
+    The disk tier holds at most disk_max_bytes: beyond that the least recently used files are deleted,
+    which also clears out frames of files that have since changed. Without disk_spill the disk tier is only
+    read, leaving its writes and its budget to another process.
+    Cached frames are copied into memory if they were memory-mapped, shared between callers and marked read-only.
+    """
+
+    def __init__(self, img_series: BaseImageSeries, max_bytes: int | None = None, disk_dir: str | None = None,
+                 disk_max_bytes: int = 8 << 30, disk_spill: bool = True) -> None:
+        """Initialize the wrapper around an image series with a cache budget in bytes (default: 5% of available memory),
+        an optional disk tier directory, its budget in bytes (default: 8 GiB) and whether to spill frames to it."""
+        self.img_series = img_series
+        self.max_bytes = _default_cache_bytes() if max_bytes is None else max_bytes
+        self.frames: OrderedDict[int, np.ndarray] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.lock = threading.Lock()
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_bytes = 0 # Bytes in the disk tier as of the last prune plus those spilled since
+        self.source_keys: dict[str, str] = {} # Path, modification time and size of each source file read so far
+        self.spiller = None
+        if disk_dir is not None and disk_spill:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.spiller = ThreadPoolExecutor(max_workers=1, thread_name_prefix='saxs-decosmic-spill')
+            self.spiller.submit(self._prune)
+
+    @property
+    def _first_frame_info(self) -> Tuple[Tuple[int, ...], np.dtype]:
+        """Get the frame shape and dtype of the wrapped series."""
+        return self.img_series._first_frame_info
+
+    @property
+    def nframes(self) -> int:
+        """Get the number of frames in the series."""
+        return self.img_series.nframes
+
+    def get_frame(self, index: int) -> np.ndarray:
+        """Get a frame at the specified index, from the cache if present."""
+        with self.lock:
+            frame = self.frames.get(index)
+            if frame is not None:
+                self.frames.move_to_end(index)
+                self.hits += 1
+                return frame
+            self.misses += 1
+
+        frame = self._read(index)
+        if frame.nbytes <= self.max_bytes and _is_mapped(frame):
+            # Copied into memory, as a cached memory map would hold its file open and its pages outside the budget
+            frame = np.array(frame)
+        frame.setflags(write=False)
+        if frame.nbytes > self.max_bytes:
+            return frame
+        with self.lock:
+            if index not in self.frames:
+                self.frames[index] = frame
+                self.nbytes += frame.nbytes
+                while self.nbytes > self.max_bytes:
+                    _, evicted = self.frames.popitem(last=False)
+                    self.nbytes -= evicted.nbytes
+        return frame
+
+    def _disk_path(self, index: int) -> str | None:
+        """Get the disk tier file of a frame, keyed on the state of its source file when first read, or None if its source is unknown."""
+        source = self.img_series.frame_source(index)
+        if source is None:
+            return None
+        filename, position = source
+        key = self.source_keys.get(filename)
+        if key is None:
+            stat = os.stat(filename)
+            key = self.source_keys[filename] = f'{os.path.abspath(filename)}:{stat.st_mtime_ns}:{stat.st_size}'
+        return os.path.join(self.disk_dir, f'{hashlib.sha1(f"{key}:{position}".encode()).hexdigest()[:24]}.npy')
+
+    def _read(self, index: int) -> np.ndarray:
+        """Read a frame from the disk tier if present, or else from the wrapped series, spilling it to the disk tier."""
+        path = None if self.disk_dir is None else self._disk_path(index)
+        if path is None:
+            return self.img_series.get_frame(index)
         try:
+            frame = np.load(path, mmap_mode='r')
+        except FileNotFoundError:
             frame = self.img_series.get_frame(index)
-            if hasattr(frame, 'data') and frame.data is not None:
-                return frame.data
-            else:
-                raise IndexError(f"Frame {index} has no data")
-        except Exception as e:
-            raise IndexError(f"Failed to get frame {index}: {str(e)}")
+            if self.spiller is not None:
+                if _is_mapped(frame):
+                    # Copied into memory, as a memory map waiting to be spilled would hold its file open
+                    frame = np.array(frame)
+                self.spiller.submit(self._spill, path, frame)
+            return frame
+        with contextlib.suppress(OSError):
+            os.utime(path) # Marks the file as recently used for pruning
+        with self.lock:
+            self.disk_hits += 1
+        return frame
+
+    def _spill(self, path: str, frame: np.ndarray) -> None:
+        """Write a frame to the disk tier, renaming it into place once complete so readers never see partial files."""
+        partial = f'{path}.{os.getpid()}.partial'
+        with open(partial, 'wb') as file:
+            np.save(file, frame)
+        os.replace(partial, path)
+        self.disk_bytes += os.path.getsize(path)
+        if self.disk_bytes > self.disk_max_bytes:
+            self._prune()
+
+    def _prune(self) -> None:
+        """Delete the least recently used files of the disk tier until it holds at most 3/4 of its budget.
+
+        Pruning below the budget leaves room for further spills before the next directory scan.
+        """
+        files = []
+        with os.scandir(self.disk_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith('.npy'):
+                    with contextlib.suppress(FileNotFoundError): # Pruned by another process
+                        stat = entry.stat()
+                        files.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        self.disk_bytes = sum(size for _, size, _ in files)
+        if self.disk_bytes <= self.disk_max_bytes:
+            return
+        for _, size, path in sorted(files):
+            if self.disk_bytes <= self.disk_max_bytes * 3 // 4:
+                break
+            with contextlib.suppress(FileNotFoundError): # Pruned by another process
+                os.remove(path)
+            self.disk_bytes -= size
+
+    def cache_info(self) -> CacheInfo:
+        """Get the cache statistics."""
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, len(self.frames), self.nbytes, self.max_bytes, self.disk_hits)
+
+    def cache_clear(self) -> None:
+        """Drop all frames cached in memory and reset the statistics (the disk tier is kept)."""
+        with self.lock:
+            self.frames.clear()
+            self.nbytes = self.hits = self.misses = self.disk_hits = 0
 
     def cleanup(self) -> None:
         """Clean up any resources held by the implementation."""
         if hasattr(self, 'img_series'):
-            self.img_series.close()
+            if self.spiller is not None:
+                self.spiller.shutdown(wait=True)
+            self.cache_clear()
+            self.img_series.cleanup()
 
 # Main Image Series Class
 
@@ -95,9 +628,32 @@ class ImageSeries:
     """Factory class for creating appropriate image series implementations."""
     
     @classmethod
-    def create(cls, first_filename: str, use_fabio: bool = False) -> BaseImageSeries:
-        """Create a new image series implementation."""
+    def create(cls, first_filename: str, use_fabio: bool = False, prefetch: int = 0, cache_bytes: int = 0,
+               cache_dir: str | None = None, cache_dir_bytes: int = 8 << 30, cache_spill: bool = True) -> BaseImageSeries:
+        """Create a new image series implementation from its first file (or, without fabio, its directory).
+
+        Up to prefetch frames are read ahead in background threads if positive. Up to cache_bytes of frames
+        are kept in an LRU cache if positive, backed by a disk tier of up to cache_dir_bytes under cache_dir if given,
+        unless the SAXS_DECOSMIC_CACHE environment variable is 0. The disk tier is shared by all series read
+        the same way, with frames keyed on their source files; without cache_spill it is only read.
+        The budgets apply per series, so per process.
+        """
         if use_fabio:
-            return FabioImageSeries(first_filename)
+            img_series = FabioImageSeries(first_filename)
+        elif os.path.isdir(first_filename):
+            img_series = ManualImageSeries(first_filename)
         else:
-            return ManualImageSeries(os.path.dirname(first_filename))
+            try:
+                img_series = StackedMemmapImageSeries(first_filename)
+            except ValueError: # One frame per file
+                # Only files with the first file's extension belong to the series
+                directory, filename = os.path.split(first_filename)
+                img_series = ManualImageSeries(directory, f"*{os.path.splitext(filename)[1]}")
+        if prefetch > 0:
+            # fabio series share one file handle, so their reads stay on a single thread
+            img_series = PrefetchingImageSeries(img_series, prefetch, max_workers=1 if use_fabio else 4)
+        if (cache_bytes > 0 or cache_dir is not None) and os.environ.get('SAXS_DECOSMIC_CACHE', '1') != '0':
+            # Frames decoded by fabio and by tifffile are kept apart in case the readers disagree
+            disk_dir = None if cache_dir is None else os.path.join(cache_dir, 'fabio' if use_fabio else 'tifffile')
+            img_series = CachedImageSeries(img_series, cache_bytes, disk_dir, cache_dir_bytes, cache_spill)
+        return img_series
@@ -1,28 +1,58 @@
 """Series image processing module with SeriesConfig, SeriesResult dataclasses and SeriesProcessor class."""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
 from copy import deepcopy
 from dataclasses import dataclass
 import logging
+import math
 import os
+import tempfile
+from queue import Full, Queue
+import threading
+from itertools import repeat
+from typing import Callable, ContextManager, Iterable, Iterator, Tuple, TypeVar
 import numpy as np
 from pathlib import Path
 
-import tifffile
 from tqdm import tqdm
 
-from .single_processor import SingleProcessor, SingleConfig
+from .single_processor import SingleBuffers, SingleProcessor, SingleConfig, SingleResult, TiffResult
 from .image_series import ImageSeries
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar('T')
+
 # Config and Result Dataclasses
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SeriesConfig(SingleConfig):
     """Configuration parameters for SeriesProcessor extending SingleConfig."""
     th_mask: float
+    batch_size: int = 16
+    batch_bytes: int = 16 << 20 # Caps batch_size so that a batch of raw frames fits, down to one frame per batch
+    accumulator_dir: str | None = None
+    progress: bool = True
+    n_workers: int | None = 1 # None uses one worker process per CPU
+    prefetch: int = 2
+    prefetch_frames: int = 0
+    cache_bytes: int = 0 # Frame cache of the main process, as worker processes only read the disk tier
+    cache_dir: str | None = None
+    cache_dir_bytes: int = 8 << 30
+
+    CHECKS = SingleConfig.CHECKS + (
+        ('th_mask', lambda value: 0 <= value <= 1, 'between 0 and 1'),
+        ('batch_size', lambda value: value >= 1, 'at least 1'),
+        ('batch_bytes', lambda value: value >= 1, 'at least 1'),
+        ('n_workers', lambda value: value is None or value >= 0, 'None or non-negative'),
+        ('prefetch', lambda value: value >= 0, 'non-negative'),
+        ('prefetch_frames', lambda value: value >= 0, 'non-negative'),
+        ('cache_bytes', lambda value: value >= 0, 'non-negative'),
+        ('cache_dir_bytes', lambda value: value >= 0, 'non-negative'),
+    )
 
 @dataclass
-class SeriesResult:
+class SeriesResult(TiffResult):
     """Results container for series processing with averages, variances and masks."""
     avg_direct: np.ndarray | None = None
     avg_binary: np.ndarray | None = None
@@ -36,29 +66,114 @@ class SeriesResult:
     var_half_clean: np.ndarray | None = None
     var_clean: np.ndarray | None = None
 
-    def save(self, output_dir: str, prefix: str = '') -> None:
-        """Save all result arrays as TIFF files in the specified directory."""
-        output_path = Path(output_dir).resolve()
-        output_path.mkdir(parents=True, exist_ok=True)
-        
-        for key, value in self.__dict__.items():
-            if value is not None:
-                tifffile.imwrite(
-                    output_path / f'{prefix}_{key}.tif',
-                    value
-                )
-        logger.info(f"Results saved to: {output_path} (prefix: {prefix})")
-
-    def load(self, input_dir: str, prefix: str = '') -> None:
-        """Load all result arrays from TIFF files in the specified directory."""
-        input_path = Path(input_dir).resolve()
-        for key in self.__dict__:
-            file_path = input_path / f'{prefix}_{key}.tif'
-            if file_path.exists():
-                setattr(self, key, tifffile.imread(file_path))
-            else:
-                raise FileNotFoundError(f"File {file_path} does not exist")
-        logger.info(f"Results loaded from: {input_path} (prefix: {prefix})")
+# Image Preprocessing and Worker Functions
+
+def _preprocess_img(img: np.ndarray, inplace: bool = False) -> np.ndarray:
+    """Preprocess raw frame(s) with outlier value handling, in place or into a new array leaving the (possibly read-only) input untouched."""
+    if inplace:
+        np.copyto(img, 0, where=img > 10000) # Big values are set to 0
+    else:
+        img = np.where(img > 10000, 0, img)
+    if img.dtype.kind == 'u':
+        return img # Unsigned frames hold neither NaN nor negative values
+    return np.fmax(img, 0, out=img) # NaN and negative values are set to 0
+
+def _batch_squares(imgs: np.ndarray, total: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Reduce a batch of images to per-pixel sums of squared deviations from the batch mean given their sum, into out."""
+    mean = np.multiply(total, 1 / len(imgs))
+    diff = np.empty_like(mean)
+    out.fill(0)
+    for img in imgs:
+        np.subtract(img, mean, out=diff)
+        np.multiply(diff, diff, out=diff)
+        out += diff
+    return out
+
+def _direct_sums(imgs: np.ndarray, out: Tuple[np.ndarray, ...] | None = None) -> Tuple[np.ndarray, ...]:
+    """Reduce a batch of preprocessed images to per-pixel sums, sums of squared deviations from the batch mean
+    and counts of positive frames, optionally into out."""
+    if out is None:
+        out = tuple(np.empty(imgs.shape[1:], dtype=dtype) for dtype in (np.float64, np.float64, np.uint32))
+    total, m2, num_positive = out
+    np.sum(imgs, axis=0, dtype=np.float64, out=total)
+    _batch_squares(imgs, total, m2)
+    np.sum(imgs > 0, axis=0, dtype=np.uint32, out=num_positive)
+    return out
+
+def _clean_sums(single_result: SingleResult, out: Tuple[np.ndarray, ...] | None = None) -> Tuple[np.ndarray, ...]:
+    """Reduce a batch of cleaned images to per-pixel sums of the half-clean, clean, donut and streak images,
+    sums of squared deviations of the half-clean and clean images from their batch means
+    and counts of the frames modified by de-donut and by either pass, optionally into out."""
+    shape = single_result.img_orig.shape[1:]
+    if out is None:
+        out = tuple(np.empty(shape, dtype=dtype) for dtype in (np.float64,) * 6 + (np.uint32,) * 2)
+    sum_half_clean, sum_clean, sum_donut, sum_streak, m2_half_clean, m2_clean, num_donut, num_combined = out
+    np.sum(single_result.img_half_clean, axis=0, dtype=np.float64, out=sum_half_clean)
+    np.sum(single_result.img_clean, axis=0, dtype=np.float64, out=sum_clean)
+    np.sum(single_result.sub_donut, axis=0, dtype=np.float64, out=sum_donut)
+    np.sum(single_result.sub_streak, axis=0, dtype=np.float64, out=sum_streak)
+    np.sum(single_result.mask_donut, axis=0, dtype=np.uint32, out=num_donut)
+    np.sum(single_result.mask_combined, axis=0, dtype=np.uint32, out=num_combined)
+    _batch_squares(single_result.img_half_clean, sum_half_clean, m2_half_clean)
+    _batch_squares(single_result.img_clean, sum_clean, m2_clean)
+    return out
+
+def _merge_squares(m2: np.ndarray, total: np.ndarray, count: int,
+                   batch_m2: np.ndarray, batch_total: np.ndarray, batch_count: int, scratch: np.ndarray) -> None:
+    """Merge the per-pixel sum of squared deviations of a batch into a running one in place (Chan et al.).
+
+    total and count describe the frames merged so far and must be updated by the caller afterwards.
+    """
+    m2 += batch_m2
+    if count == 0:
+        return
+    # batch_count * (batch mean - running mean)
+    np.multiply(total, batch_count / count, out=scratch)
+    np.subtract(batch_total, scratch, out=scratch)
+    np.multiply(scratch, scratch, out=scratch)
+    np.multiply(scratch, count / (batch_count * (count + batch_count)), out=scratch)
+    m2 += scratch
+
+def _batch_frames(series_config: SeriesConfig, frame_shape: Tuple[int, ...], dtype: np.dtype) -> int:
+    """Get the number of frames per batch, series_config.batch_size unless fewer frames fill series_config.batch_bytes.
+
+    Every batch in flight and every scratch buffer of the cleaning scales with it, in each worker process.
+    """
+    frame_bytes = math.prod(frame_shape) * np.dtype(dtype).itemsize
+    return max(1, min(series_config.batch_size, series_config.batch_bytes // frame_bytes))
+
+_worker_state: dict = {}
+
+def _init_worker(first_filename: str, use_fabio: bool, series_config: SeriesConfig, mask_modifiable: np.ndarray) -> None:
+    """Open the image series once per worker process and keep the cleaning configuration, mask and batch-sized buffers.
+
+    Workers read each frame of their batches once, so they keep no frames in memory. They only read the disk tier,
+    which the main process filled in the direct pass, so that its budget is enforced by a single process.
+    """
+    img_series = ImageSeries.create(first_filename, use_fabio, series_config.prefetch_frames, 0, series_config.cache_dir, series_config.cache_dir_bytes, cache_spill=False)
+    shape = (_batch_frames(series_config, img_series.frame_shape, img_series.dtype), *img_series.frame_shape)
+    _worker_state['img_series'] = img_series
+    _worker_state['series_config'] = series_config
+    _worker_state['mask_modifiable'] = mask_modifiable
+    _worker_state['slab'] = np.empty(shape, dtype=img_series.dtype)
+    _worker_state['buffers'] = SingleBuffers.allocate(shape, img_series.dtype)
+    _worker_state['processor'] = None
+
+def _clean_batch(start: int, stop: int, reduce: Callable[..., Tuple[np.ndarray, ...]], args: tuple) -> Tuple[np.ndarray, ...]:
+    """Clean the frames in the index range [start, stop) inside a worker process and reduce them with reduce(result, *args)."""
+    img_series = _worker_state['img_series']
+    imgs = _preprocess_img(img_series.get_frames(range(start, stop), out=_worker_state['slab'][:stop - start]), inplace=True)
+    processor = _worker_state['processor']
+    if processor is None:
+        processor = _worker_state['processor'] = SingleProcessor(
+            imgs,
+            _worker_state['series_config'],
+            _worker_state['mask_modifiable'],
+            _worker_state['buffers']
+        )
+    else:
+        processor.reset(imgs)
+    return reduce(processor.clean_img(), *args)
 
 # Series Processor Class
 
@@ -80,6 +195,7 @@ class SeriesProcessor:
             )
             self.series_config = series_config
             self.first_filename = str(Path(first_filename).resolve())
+            self.use_fabio = use_fabio
             if not os.path.isfile(self.first_filename):
                 raise FileNotFoundError(f"File {self.first_filename} not found")
             self._load_images(self.first_filename, use_fabio=use_fabio)
@@ -98,15 +214,15 @@ class SeriesProcessor:
             logger.info(f"Loading images from {first_filename} ...")
             
             # Create image series using the new ImageSeries class
-            self.img_series = ImageSeries.create(first_filename, use_fabio)
+            self.img_series = ImageSeries.create(first_filename, use_fabio, self.series_config.prefetch_frames, self.series_config.cache_bytes, self.series_config.cache_dir, self.series_config.cache_dir_bytes)
             
             # Get number of frames
             self.nframes = self.img_series.nframes
             
-            # Get shape and dtype from first frame
-            first_frame = self.img_series.get_frame(0)
-            self.shape = first_frame.shape
-            self.dtype = first_frame.dtype
+            # Get shape and dtype, probed once by the series
+            self.shape = self.img_series.frame_shape
+            self.dtype = self.img_series.dtype
+            self.batch_size = _batch_frames(self.series_config, self.shape, self.dtype)
 
             logger.info(f"Loaded {self.nframes} images.")
             logger.info(f"Image shape: {self.shape}")
@@ -115,35 +231,166 @@ class SeriesProcessor:
             logger.error(f"Failed to load images from {first_filename}: {str(e)}")
             raise
 
-    def _get_img(self, idx: int) -> np.ndarray:
-        """Get a single preprocessed image from the series with outlier value handling."""
+    def _get_batch(self, start: int, stop: int, out: np.ndarray | None = None) -> np.ndarray:
+        """Get a stack of preprocessed images from the series for the index range [start, stop), optionally into out."""
         try:
-            img = self.img_series.get_frame(idx)
-            img[img>10000] = 0 # Big values are set to 0
-            img = np.nan_to_num(img, nan=0) # NaN values are set to 0
-            img = np.clip(img, 0, None) # Negative values are set to 0
-            return img
+            imgs = self.img_series.get_frames(range(start, stop), out=None if out is None else out[:stop - start])
+            return _preprocess_img(imgs, inplace=True)
         except Exception as e:
-            logger.error(f"Failed to get image at index {idx}: {str(e)}")
+            logger.error(f"Failed to get images in range [{start}, {stop}): {str(e)}")
             raise
+
+    def _read_ahead(self, items: Iterable[T]) -> Iterator[T]:
+        """Produce items in a background thread, keeping up to series_config.prefetch of them ready for the consumer."""
+        if self.series_config.prefetch <= 0:
+            yield from items
+            return
+
+        ready: Queue = Queue(maxsize=self.series_config.prefetch)
+        stop = threading.Event()
+
+        def put(entry: tuple) -> bool:
+            while not stop.is_set():
+                try:
+                    ready.put(entry, timeout=0.1)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        def produce() -> None:
+            try:
+                for item in items:
+                    if not put((True, item)):
+                        return
+            except Exception as e:
+                put((False, e))
+                return
+            put((False, None))
+
+        producer = threading.Thread(target=produce, name='saxs-decosmic-read-ahead', daemon=True)
+        producer.start()
+        try:
+            while True:
+                is_item, item = ready.get()
+                if not is_item:
+                    if item is not None:
+                        raise item
+                    return
+                yield item
+        finally:
+            stop.set()
+            producer.join()
+
+    def _batches(self) -> Iterator[np.ndarray]:
+        """Read the preprocessed series in stacks of batch_size frames, reading ahead in a background thread.
+
+        The stacks are views of a few reused slabs, so each one is only valid until the next is requested.
+        """
+        batch_size = self.batch_size
+        # One slab per batch that can be in flight: queued, being read and being processed
+        slabs = np.empty((max(self.series_config.prefetch, 0) + 2, batch_size, *self.shape), dtype=self.dtype)
+        yield from self._read_ahead(
+            self._get_batch(start, min(start + batch_size, self.nframes), slabs[k % len(slabs)])
+            for k, start in enumerate(range(0, self.nframes, batch_size))
+        )
+
+    def _clean_batches(self, desc: str, reduce: Callable[..., Tuple[np.ndarray, ...]], *args) -> Iterator[Tuple[int, Tuple[np.ndarray, ...]]]:
+        """Clean the series batch by batch, in this process or in a pool of worker processes, yielding the batch size and reduce(result, *args) per batch.
+
+        reduce must be a module-level function so that workers can run it and send back only its per-pixel reductions.
+        In this process the reductions are written into the same arrays every batch.
+        """
+        batch_size = self.batch_size
+        starts = range(0, self.nframes, batch_size)
+        stops = [min(start + batch_size, self.nframes) for start in starts]
+
+        n_workers = (os.cpu_count() or 1) if self.series_config.n_workers is None else self.series_config.n_workers
+        with self._progress(desc) as pbar:
+            if n_workers <= 1:
+                processor = None
+                reductions = None
+                for imgs in self._batches():
+                    if processor is None:
+                        processor = SingleProcessor(
+                            imgs,
+                            self.series_config,
+                            self.series_result.mask_modifiable,
+                            SingleBuffers.allocate((batch_size, *self.shape), self.dtype)
+                        )
+                    else:
+                        processor.reset(imgs)
+                    reductions = reduce(processor.clean_img(), *args, out=reductions)
+                    yield len(imgs), reductions
+                    pbar.update(len(imgs))
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=n_workers,
+                    initializer=_init_worker,
+                    initargs=(self.first_filename, self.use_fabio, self.series_config, self.series_result.mask_modifiable),
+                ) as executor:
+                    for start, stop, reductions in zip(starts, stops, executor.map(_clean_batch, starts, stops, repeat(reduce), repeat(args))):
+                        yield stop - start, reductions
+                        pbar.update(stop - start)
+    
+    def _progress(self, desc: str) -> tqdm:
+        """Create a progress bar over the frames that refreshes at most once per second."""
+        return tqdm(
+            desc=desc,
+            total=self.nframes,
+            mininterval=1.0,
+            smoothing=0,
+            leave=False,
+            disable=not self.series_config.progress,
+        )
+
+    def _accumulator_dir(self) -> ContextManager[str | None]:
+        """Get a temporary directory for memory-mapped accumulators, or None to keep them in memory."""
+        if self.series_config.accumulator_dir is None:
+            return nullcontext()
+        Path(self.series_config.accumulator_dir).mkdir(parents=True, exist_ok=True)
+        return tempfile.TemporaryDirectory(prefix='saxs_decosmic_', dir=self.series_config.accumulator_dir)
+
+    def _accumulator(self, workdir: str | None, name: str, dtype: type, fill: float) -> np.ndarray:
+        """Allocate an image-sized accumulator filled with a value, memory-mapped under workdir if given."""
+        if workdir is None:
+            return np.full(self.shape, fill, dtype=dtype)
+        accumulator = np.memmap(os.path.join(workdir, f'{name}.raw'), dtype=dtype, mode='w+', shape=self.shape)
+        accumulator[...] = fill
+        return accumulator
+    
+    def _count_dtype(self) -> type:
+        """Get the narrowest unsigned integer type that can count every frame of the series."""
+        return np.uint16 if self.nframes <= np.iinfo(np.uint16).max else np.uint32
     
     def _avg_direct(self) -> None:
-        """Calculate direct average of all images and their binary representations."""
+        """Calculate direct average and variance of all images and the average of their binary representations in one pass.
+
+        Each batch is reduced to its sum and squared deviations from its own mean, which are merged into running ones (Chan et al.),
+        so the series is only read once.
+        """
         try:
-            sum_direct = np.zeros(self.shape, dtype=np.float64)
-            sum_binary = np.zeros(self.shape, dtype=np.float64)
+            total = np.zeros(self.shape, dtype=np.float64)
+            m2 = np.zeros(self.shape, dtype=np.float64)
+            num_binary = np.zeros(self.shape, dtype=self._count_dtype())
+            scratch = np.empty(self.shape, dtype=np.float64)
+            reductions = None
+            count = 0
             logger.info('Direct averaging images ...')
             
-            for i in tqdm(range(self.nframes), desc='Direct-averaging images'):
-                img = self._get_img(i)
-                sum_direct += img
-
-                img_binary = (img > 0).astype(self.dtype)
-                sum_binary += img_binary
+            with self._progress('Direct-averaging images') as pbar:
+                for imgs in self._batches():
+                    batch_total, batch_m2, batch_num_positive = reductions = _direct_sums(imgs, out=reductions)
+                    _merge_squares(m2, total, count, batch_m2, batch_total, len(imgs), scratch)
+                    count += len(imgs)
+                    total += batch_total
+                    num_binary += batch_num_positive
+                    pbar.update(len(imgs))
             
-            self.series_result.avg_direct = sum_direct / self.nframes
-            self.series_result.avg_binary = sum_binary / self.nframes
-            logger.debug("Direct-average finished")
+            self.series_result.avg_direct = np.divide(total, self.nframes, out=total)
+            self.series_result.avg_binary = num_binary / self.nframes
+            self.series_result.var_direct = np.divide(m2, self.nframes, out=m2)
+            logger.debug("Direct-average and direct-variance finished")
         except Exception as e:
             logger.error(f"Direct-average failed: {str(e)}")
             raise
@@ -168,103 +415,66 @@ class SeriesProcessor:
             raise
 
     def _avg_clean(self) -> None:
-        """Process all images to remove high energy background and calculate cleaned averages."""
+        """Process all images to remove high energy background and calculate cleaned averages and variances in one pass.
+
+        The variances are taken over all frames around the averages over the unmodified ones, which is
+        M2 / N + (mean - average)**2 with M2 the squared deviations from the mean over all frames.
+        """
         try:
             if self.series_result.mask_modifiable is None:
                 raise ValueError("Modifiable mask not calculated")
             
-            sum_half_clean = np.zeros(self.shape, dtype=np.float64)
-            sum_clean = np.zeros(self.shape, dtype=np.float64)
-            sum_donut = np.zeros(self.shape, dtype=np.float64)
-            sum_streak = np.zeros(self.shape, dtype=np.float64)
-            num_half_clean = np.ones(self.shape, dtype=np.int32) * self.nframes
-            num_clean = np.ones(self.shape, dtype=np.int32) * self.nframes
-            
-            logger.info('Cleaning images ...')
-            for i in tqdm(range(self.nframes), desc='Cleaning images'):
-                img = self._get_img(i)
-                processor = SingleProcessor(
-                    img,
-                    self.series_config,
-                    self.series_result.mask_modifiable
-                )
-                single_result = processor.clean_img()
-                
-                if single_result.img_half_clean is not None:
-                    sum_half_clean += single_result.img_half_clean
-                if single_result.img_clean is not None:
-                    sum_clean += single_result.img_clean
-                if single_result.sub_donut is not None:
-                    sum_donut += single_result.sub_donut
-                if single_result.sub_streak is not None:
-                    sum_streak += single_result.sub_streak
-                if single_result.mask_donut is not None:
-                    num_half_clean -= single_result.mask_donut.astype(np.int32)
-                if single_result.mask_combined is not None:
-                    num_clean -= single_result.mask_combined.astype(np.int32)
-            
-            self.series_result.avg_half_clean = np.divide(sum_half_clean, num_half_clean, out=np.zeros_like(sum_half_clean), where=num_half_clean != 0)
-            self.series_result.avg_clean = np.divide(sum_clean, num_clean, out=np.zeros_like(sum_clean), where=num_clean != 0)
-            self.series_result.avg_donut = sum_donut / self.nframes
-            self.series_result.avg_streak = sum_streak / self.nframes
-            logger.debug("Clean-average finished")
+            with self._accumulator_dir() as workdir:
+                sum_half_clean = self._accumulator(workdir, 'sum_half_clean', np.float64, 0)
+                sum_clean = self._accumulator(workdir, 'sum_clean', np.float64, 0)
+                sum_donut = self._accumulator(workdir, 'sum_donut', np.float64, 0)
+                sum_streak = self._accumulator(workdir, 'sum_streak', np.float64, 0)
+                m2_half_clean = self._accumulator(workdir, 'm2_half_clean', np.float64, 0)
+                m2_clean = self._accumulator(workdir, 'm2_clean', np.float64, 0)
+                num_half_clean = self._accumulator(workdir, 'num_half_clean', self._count_dtype(), self.nframes)
+                num_clean = self._accumulator(workdir, 'num_clean', self._count_dtype(), self.nframes)
+                try:
+                    scratch = np.empty(self.shape, dtype=np.float64)
+                    count = 0
+
+                    logger.info('Cleaning images ...')
+                    for batch_count, (batch_half_clean, batch_clean, batch_donut, batch_streak,
+                                      batch_m2_half_clean, batch_m2_clean, batch_num_donut, batch_num_combined) in self._clean_batches('Cleaning images', _clean_sums):
+                        _merge_squares(m2_half_clean, sum_half_clean, count, batch_m2_half_clean, batch_half_clean, batch_count, scratch)
+                        _merge_squares(m2_clean, sum_clean, count, batch_m2_clean, batch_clean, batch_count, scratch)
+                        count += batch_count
+                        sum_half_clean += batch_half_clean
+                        sum_clean += batch_clean
+                        sum_donut += batch_donut
+                        sum_streak += batch_streak
+                        np.subtract(num_half_clean, batch_num_donut, out=num_half_clean)
+                        np.subtract(num_clean, batch_num_combined, out=num_clean)
+
+                    self.series_result.avg_half_clean = np.divide(sum_half_clean, num_half_clean, out=np.zeros(self.shape, dtype=np.float64), where=num_half_clean != 0)
+                    self.series_result.avg_clean = np.divide(sum_clean, num_clean, out=np.zeros(self.shape, dtype=np.float64), where=num_clean != 0)
+                    self.series_result.avg_donut = sum_donut / self.nframes
+                    self.series_result.avg_streak = sum_streak / self.nframes
+                    self.series_result.var_half_clean = self._shifted_variance(m2_half_clean, sum_half_clean, self.series_result.avg_half_clean)
+                    self.series_result.var_clean = self._shifted_variance(m2_clean, sum_clean, self.series_result.avg_clean)
+                finally:
+                    # Unmapped before the directory is removed, which fails on Windows while its files are mapped
+                    del sum_half_clean, sum_clean, sum_donut, sum_streak, m2_half_clean, m2_clean, num_half_clean, num_clean
+            logger.debug("Clean-average and clean-variance finished")
         except Exception as e:
             logger.error(f"Clean-average failed: {str(e)}")
             raise
 
-    def _var_direct(self) -> None:
-        """Calculate variance of direct average across all images."""
-        try:
-            if self.series_result.avg_direct is None:
-                raise ValueError("Direct average not calculated")
-            
-            sum_variance = np.zeros(self.shape, dtype=np.float64)
-            logger.info('Calculating direct variance ...')
-            
-            for i in tqdm(range(self.nframes), desc='Calculating direct variance'):
-                img = self._get_img(i)
-                diff = img - self.series_result.avg_direct
-                sum_variance += diff ** 2
-            
-            self.series_result.var_direct = sum_variance / self.nframes
-            logger.debug("Direct-variance calculated")
-        except Exception as e:
-            logger.error(f"Direct-variance calculation failed: {str(e)}")
-            raise
+    def _shifted_variance(self, m2: np.ndarray, total: np.ndarray, avg: np.ndarray) -> np.ndarray:
+        """Get the mean squared deviation of all frames from avg given their sum of squared deviations from their mean and their sum.
 
-    def _var_clean(self) -> None:
-        """Calculate variance of cleaned average across all processed images."""
-        try:
-            if self.series_result.avg_clean is None or self.series_result.mask_modifiable is None:
-                raise ValueError("Clean average or modifiable mask not calculated")
-            
-            sum_variance_half_clean = np.zeros(self.shape, dtype=np.float64)
-            sum_variance_clean = np.zeros(self.shape, dtype=np.float64)
-            logger.info('Calculating clean variance ...')
-            
-            for i in tqdm(range(self.nframes), desc='Calculating clean variance'):
-                img = self._get_img(i)
-                processor = SingleProcessor(
-                    img,
-                    self.series_config,
-                    self.series_result.mask_modifiable
-                )
-                single_result = processor.clean_img()
-                
-                if single_result.img_half_clean is not None and self.series_result.avg_half_clean is not None:
-                    diff_half_clean = single_result.img_half_clean - self.series_result.avg_half_clean
-                    sum_variance_half_clean += diff_half_clean ** 2
-                
-                if single_result.img_clean is not None and self.series_result.avg_clean is not None:
-                    diff_clean = single_result.img_clean - self.series_result.avg_clean
-                    sum_variance_clean += diff_clean ** 2
-            
-            self.series_result.var_half_clean = sum_variance_half_clean / self.nframes
-            self.series_result.var_clean = sum_variance_clean / self.nframes
-            logger.debug("Clean-variance calculated")
-        except Exception as e:
-            logger.error(f"Clean-variance calculation failed: {str(e)}")
-            raise
+        m2 is scaled in place, so it must be a scratch accumulator.
+        """
+        shift = np.divide(total, self.nframes)
+        shift -= avg
+        shift *= shift
+        m2 /= self.nframes
+        shift += m2
+        return shift
 
     # Public Methods
     
@@ -273,19 +483,15 @@ class SeriesProcessor:
         try:
             logger.info("Starting series processing pipeline")
 
-            # Step 1: Calculate direct average and binary average
+            # Step 1: Calculate direct average, binary average and direct variance
             self._avg_direct()
 
             # Step 2: Create protection mask
             self._mask()
 
-            # Step 3: Calculate clean average  
+            # Step 3: Calculate clean averages and variances
             self._avg_clean()
 
-            # Step 4: Calculate variances
-            self._var_direct()
-            self._var_clean()
-
             logger.info("Series processing pipeline completed successfully")
             return deepcopy(self.series_result)
         except Exception as e:
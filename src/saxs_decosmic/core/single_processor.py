@@ -1,11 +1,13 @@
 """Single image processing module with SingleConfig, SingleResult dataclasses and SingleProcessor class."""
-from copy import deepcopy
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
 import logging
+import math
 from pathlib import Path
 import numpy as np
-from scipy.ndimage import convolve, maximum_filter
-from typing import Tuple
+from numpy.typing import DTypeLike
+from scipy.ndimage import convolve1d, maximum_filter1d
+from typing import Any, Callable, ClassVar, Tuple
 
 import tifffile
 
@@ -13,7 +15,7 @@ logger = logging.getLogger(__name__)
 
 # Config and Result Dataclasses
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class SingleConfig:
     """Configuration parameters for SingleProcessor."""
     th_donut: int
@@ -21,31 +23,55 @@ class SingleConfig:
     win_streak: int
     exp_donut: int
     exp_streak: int
+    tile_size: int | None = field(default=None, kw_only=True)
 
-@dataclass
-class SingleResult:
-    """Results container for single image processing with original, cleaned images and masks."""
-    img_orig: np.ndarray
-    img_half_clean: np.ndarray | None = None
-    img_clean: np.ndarray | None = None
-    mask_modifiable: np.ndarray | None = None
-    mask_donut: np.ndarray | None = None
-    mask_streak: np.ndarray | None = None
-    mask_combined: np.ndarray | None = None
-    sub_donut: np.ndarray | None = None
-    sub_streak: np.ndarray | None = None
+    # (field, check, requirement) rows verified by validate()
+    CHECKS: ClassVar[Tuple[Tuple[str, Callable[[Any], bool], str], ...]] = (
+        ('th_streak', lambda value: value >= 1, 'at least 1'),
+        ('win_streak', lambda value: value >= 1, 'at least 1'),
+        ('exp_donut', lambda value: value >= 1, 'at least 1'),
+        ('exp_streak', lambda value: value >= 1, 'at least 1'),
+        ('tile_size', lambda value: value is None or value >= 1, 'None or at least 1'),
+    )
+    # (field, check on the whole config, requirement) rows relating fields, verified after CHECKS
+    RELATIONS: ClassVar[Tuple[Tuple[str, Callable[[Any], bool], str], ...]] = (
+        ('th_streak', lambda config: config.th_streak <= config.win_streak ** 2, 'at most win_streak**2 to ever detect a streak'),
+    )
+
+    def __post_init__(self) -> None:
+        """Validate the configuration once on construction; it is frozen afterwards."""
+        self.validate()
+
+    def validate(self) -> None:
+        """Check every parameter against the CHECKS and RELATIONS tables, raising ValueError for the first one out of range."""
+        for name, check, requirement in self.CHECKS:
+            value = getattr(self, name)
+            if not check(value):
+                raise ValueError(f"{type(self).__name__}.{name} must be {requirement}, got {value!r}")
+        for name, check, requirement in self.RELATIONS:
+            if not check(self):
+                raise ValueError(f"{type(self).__name__}.{name} must be {requirement}, got {getattr(self, name)!r}")
 
-    def save(self, output_dir: str, prefix: str = '') -> None:
-        """Save all result arrays as TIFF files in the specified directory."""
+class TiffResult:
+    """Base for result containers whose array fields are saved and loaded as one TIFF file each."""
+
+    def save(self, output_dir: str, prefix: str = '', float_dtype: DTypeLike | None = None) -> None:
+        """Save all result arrays as TIFF files in the specified directory.
+
+        With float_dtype (e.g. np.float32), floating-point arrays are written in that type to shrink the files.
+        """
         output_path = Path(output_dir).resolve()
         output_path.mkdir(parents=True, exist_ok=True)
         
-        for key, value in self.__dict__.items():
-            if value is not None:
-                tifffile.imwrite(
-                    output_path / f'{prefix}_{key}.tif',
-                    value
-                )
+        # The files are independent and tifffile releases the GIL while encoding and writing, so write them concurrently
+        items = [
+            (output_path / f'{prefix}_{key}.tif',
+             value.astype(float_dtype, copy=False) if float_dtype is not None and np.issubdtype(value.dtype, np.floating) else value)
+            for key, value in self.__dict__.items() if value is not None
+        ]
+        with ThreadPoolExecutor(max_workers=min(4, max(len(items), 1)), thread_name_prefix='saxs-decosmic-save') as executor:
+            for _ in executor.map(lambda item: tifffile.imwrite(*item), items):
+                pass
         logger.info(f"Results saved to: {output_path} (prefix: {prefix})")
 
     def load(self, input_dir: str, prefix: str = '') -> None:
@@ -58,6 +84,57 @@ class SingleResult:
             else:
                 raise FileNotFoundError(f"File {file_path} does not exist")
         logger.info(f"Results loaded from: {input_path} (prefix: {prefix})")
+
+@dataclass
+class SingleResult(TiffResult):
+    """Results container for single image processing with original, cleaned images and masks."""
+    img_orig: np.ndarray
+    img_half_clean: np.ndarray | None = None
+    img_clean: np.ndarray | None = None
+    mask_modifiable: np.ndarray | None = None
+    mask_donut: np.ndarray | None = None
+    mask_streak: np.ndarray | None = None
+    mask_combined: np.ndarray | None = None
+    sub_donut: np.ndarray | None = None
+    sub_streak: np.ndarray | None = None
+
+@dataclass
+class SingleBuffers:
+    """Preallocated output and scratch arrays shared by SingleProcessor runs on images up to a given shape."""
+    img_half_clean: np.ndarray
+    img_clean: np.ndarray
+    sub_donut: np.ndarray
+    sub_streak: np.ndarray
+    mask_donut: np.ndarray
+    mask_streak: np.ndarray
+    mask_combined: np.ndarray
+    mask_detected: np.ndarray
+    mask_rows: np.ndarray
+    img_binary: np.ndarray
+    img_rows: np.ndarray
+    img_conv: np.ndarray
+    img_tile: np.ndarray
+    mask_tile: np.ndarray
+
+    @classmethod
+    def allocate(cls, shape: Tuple[int, ...], dtype: DTypeLike) -> 'SingleBuffers':
+        """Allocate buffers for images (or stacks of images) of the given shape and dtype."""
+        return cls(
+            img_half_clean=np.empty(shape, dtype=dtype),
+            img_clean=np.empty(shape, dtype=dtype),
+            sub_donut=np.empty(shape, dtype=dtype),
+            sub_streak=np.empty(shape, dtype=dtype),
+            mask_donut=np.empty(shape, dtype=bool),
+            mask_streak=np.empty(shape, dtype=bool),
+            mask_combined=np.empty(shape, dtype=bool),
+            mask_detected=np.empty(shape, dtype=bool),
+            mask_rows=np.empty(shape, dtype=bool),
+            img_binary=np.empty(shape, dtype=np.uint8),
+            img_rows=np.empty(shape, dtype=np.uint16),
+            img_conv=np.empty(shape, dtype=np.uint16),
+            img_tile=np.empty(shape, dtype=dtype),
+            mask_tile=np.empty(shape, dtype=bool),
+        )
         
 # Single Image Processor Class
 
@@ -69,25 +146,25 @@ class SingleProcessor:
     def __init__(self,
                  img_orig: np.ndarray,
                  single_config: SingleConfig,
-                 mask_modifiable: np.ndarray | None = None) -> None:
-        """Initialize the image processor with input image, configuration and optional mask."""
+                 mask_modifiable: np.ndarray | None = None,
+                 buffers: SingleBuffers | None = None) -> None:
+        """Initialize the image processor with input image (or stack of images), configuration, optional mask and optional buffers.
+
+        With buffers, the result arrays are views into them and stay valid only until the buffers are reused.
+        """
         try:
-            if not isinstance(img_orig, np.ndarray):
-                raise TypeError("Input image must be a numpy array")
             if mask_modifiable is None:
-                mask_modifiable = np.ones(img_orig.shape, dtype=bool)
+                mask_modifiable = np.ones(np.shape(img_orig)[-2:], dtype=bool)
             if not isinstance(mask_modifiable, np.ndarray):
                 raise TypeError("Input mask must be a numpy array")
-            if img_orig.shape != mask_modifiable.shape:
-                raise ValueError(f"Image shape {img_orig.shape} does not match mask shape {mask_modifiable.shape}")
+            if single_config.win_streak ** 2 > np.iinfo(np.uint16).max:
+                raise ValueError(f"Streak window {single_config.win_streak} is too large, its area must fit in uint16")
             
-            self.single_result = SingleResult(
-                img_orig=img_orig,
-                mask_modifiable=mask_modifiable,
-            )
             self.single_config = single_config
-            self.shape = img_orig.shape
-            self.dtype = img_orig.dtype
+            self.buffers = buffers
+            self._set_img(img_orig, mask_modifiable)
+            self.conv_kernel = np.ones(single_config.win_streak, dtype=np.uint16)
+            self.tiles = self._plan_tiles(mask_modifiable)
             
             logger.debug(f"SingleProcessor initialized.")
             logger.debug(f"Configuration: {self.single_config}")
@@ -96,81 +173,207 @@ class SingleProcessor:
             raise
 
     # Private Methods
+
+    def _set_img(self, img_orig: np.ndarray, mask_modifiable: np.ndarray) -> None:
+        """Check an input image (or stack of images) against the mask and buffers and start a new result for it."""
+        if not isinstance(img_orig, np.ndarray):
+            raise TypeError("Input image must be a numpy array")
+        if img_orig.ndim not in (2, 3):
+            raise ValueError(f"Input image must be 2-D or a 3-D stack of images, got {img_orig.ndim}-D")
+        if img_orig.shape[-2:] != mask_modifiable.shape:
+            raise ValueError(f"Image shape {img_orig.shape} does not match mask shape {mask_modifiable.shape}")
+        if self.buffers is not None and (self.buffers.img_clean.dtype != img_orig.dtype or self.buffers.img_clean.size < img_orig.size):
+            raise ValueError(f"Buffers {self.buffers.img_clean.shape} {self.buffers.img_clean.dtype} cannot hold image {img_orig.shape} {img_orig.dtype}")
+        
+        self.single_result = SingleResult(
+            img_orig=img_orig,
+            mask_modifiable=mask_modifiable,
+        )
+        self.shape = img_orig.shape
+        self.dtype = img_orig.dtype
+
+    def _buffer(self, name: str, dtype: DTypeLike, shape: Tuple[int, ...] | None = None) -> np.ndarray:
+        """Get an array of the given shape (default: image shape), carved from the shared buffers when available."""
+        shape = self.shape if shape is None else shape
+        if self.buffers is None:
+            return np.empty(shape, dtype=dtype)
+        return getattr(self.buffers, name).reshape(-1)[:math.prod(shape)].reshape(shape)
+
+    @staticmethod
+    def _window3(src: np.ndarray, axis: int, out: np.ndarray) -> np.ndarray:
+        """Add each pixel to its two neighbours along an axis (zero beyond the edges) using shifted in-place additions.
+
+        On boolean masks the additions are logical ors, so this is a 3-wide dilation.
+        """
+        head = [slice(None)] * src.ndim
+        tail = [slice(None)] * src.ndim
+        head[axis], tail[axis] = slice(1, None), slice(None, -1)
+        head, tail = tuple(head), tuple(tail)
+        np.copyto(out, src)
+        out[head] += src[tail]
+        out[tail] += src[head]
+        return out
+
+    def _box_sum(self, img_binary: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """Sum a uint8 binary image over a win_streak x win_streak window into uint16 as two separable 1-D convolutions."""
+        if self.single_config.win_streak == 3:
+            img_rows = self._window3(img_binary, -2, self._buffer('img_rows', np.uint16, img_binary.shape))
+            return self._window3(img_rows, -1, out)
+        img_rows = convolve1d(img_binary, self.conv_kernel, axis=-2, output=self._buffer('img_rows', np.uint16, img_binary.shape), mode='constant', cval=0)
+        return convolve1d(img_rows, self.conv_kernel, axis=-1, output=out, mode='constant', cval=0)
+
+    def _expand(self, mask: np.ndarray, size: int, out: np.ndarray) -> np.ndarray:
+        """Dilate a mask over the image plane with a size x size window as two separable 1-D maximum filters."""
+        if size == 3:
+            mask_rows = self._window3(mask, -2, self._buffer('mask_rows', bool, mask.shape))
+            return self._window3(mask_rows, -1, out)
+        mask_rows = maximum_filter1d(mask, size, axis=-2, output=self._buffer('mask_rows', bool, mask.shape))
+        return maximum_filter1d(mask_rows, size, axis=-1, output=out)
+
+    def _plan_tiles(self, mask_modifiable: np.ndarray) -> list[Tuple[Tuple[slice, slice], Tuple[slice, slice], Tuple[slice, slice]]]:
+        """Plan (inner, outer, local) plane slices of the tiles that contain modifiable pixels.
+
+        Tiles cover the bounding box of the modifiable mask (as a single tile when tile_size is unset)
+        and are padded by the reach of the cleaning filters; pixels outside every tile are never modified.
+        """
+        rows = np.flatnonzero(mask_modifiable.any(axis=1))
+        cols = np.flatnonzero(mask_modifiable.any(axis=0))
+        if rows.size == 0:
+            return []
+        top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        tile_size = self.single_config.tile_size or max(bottom - top, right - left)
+        halo = self.single_config.exp_donut // 2 + self.single_config.win_streak // 2 + self.single_config.exp_streak // 2
+        height, width = mask_modifiable.shape
+        tiles = []
+        for y0 in range(top, bottom, tile_size):
+            y1 = min(y0 + tile_size, bottom)
+            pad_y0, pad_y1 = max(y0 - halo, 0), min(y1 + halo, height)
+            for x0 in range(left, right, tile_size):
+                x1 = min(x0 + tile_size, right)
+                if not mask_modifiable[y0:y1, x0:x1].any():
+                    continue
+                pad_x0, pad_x1 = max(x0 - halo, 0), min(x1 + halo, width)
+                tiles.append((
+                    (slice(y0, y1), slice(x0, x1)),
+                    (slice(pad_y0, pad_y1), slice(pad_x0, pad_x1)),
+                    (slice(y0 - pad_y0, y1 - pad_y0), slice(x0 - pad_x0, x1 - pad_x0)),
+                ))
+        return tiles
+
+    def _clean_tiled(self, img_orig: np.ndarray, mask_modifiable: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """Run de-donut and de-streak on the planned tiles only, leaving the rest of the image untouched."""
+        img_half_clean = self._buffer('img_half_clean', self.dtype)
+        img_clean = self._buffer('img_clean', self.dtype)
+        mask_donut = self._buffer('mask_donut', bool)
+        mask_streak = self._buffer('mask_streak', bool)
+        np.copyto(img_half_clean, img_orig)
+        np.copyto(img_clean, img_orig)
+        mask_donut.fill(False)
+        mask_streak.fill(False)
+        lead = (slice(None),) * (len(self.shape) - 2)
+
+        for inner, outer, local in self.tiles:
+            tile = self._buffer('img_tile', self.dtype, img_orig[lead + outer].shape)
+            np.copyto(tile, img_orig[lead + outer])
+            tile_mask = self._buffer('mask_tile', bool, tile.shape)
+            self._de_donut(tile, mask_modifiable[outer], out=tile_mask)
+            img_half_clean[lead + inner] = tile[lead + local]
+            mask_donut[lead + inner] = tile_mask[lead + local]
+            self._de_streak(tile, mask_modifiable[outer], out=tile_mask)
+            img_clean[lead + inner] = tile[lead + local]
+            mask_streak[lead + inner] = tile_mask[lead + local]
+        return img_half_clean, mask_donut, img_clean, mask_streak
     
-    def _de_donut(self, img_orig: np.ndarray, mask_modifiable: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """Remove donut-shaped features using threshold-based detection and morphological expansion."""
+    def _de_donut(self, img: np.ndarray, mask_modifiable: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Remove donut-shaped features in place using threshold-based detection and morphological expansion, returning the modified mask."""
         try:
-            if self.single_config is None:
-                raise ValueError("Configuration is not set")
-            if not isinstance(img_orig, np.ndarray) or not isinstance(mask_modifiable, np.ndarray):
-                raise TypeError("Input image and mask must be numpy arrays")
-            if img_orig.shape != mask_modifiable.shape:
-                raise ValueError(f"Image shape {img_orig.shape} does not match mask shape {mask_modifiable.shape}")
-            
             logger.debug(f"Starting de-donut with threshold: {self.single_config.th_donut}")
 
-            img_orig_copy = np.copy(img_orig)
-            mask_modifiable_copy = np.copy(mask_modifiable)
-
-            donut_mask = img_orig_copy >= self.single_config.th_donut
-            donut_mask_expanded = maximum_filter(donut_mask, size=self.single_config.exp_donut)
-            mask_modified = donut_mask_expanded & mask_modifiable_copy
-            img_orig_copy[mask_modified] = 0
-            logger.debug(f"De-donut complete. Modified pixels: {np.sum(mask_modified)}")
-            return img_orig_copy, mask_modified
+            donut_mask = np.greater_equal(img, self.single_config.th_donut, out=self._buffer('mask_detected', bool, img.shape))
+            mask_modified = np.empty(img.shape, dtype=bool) if out is None else out
+            if not donut_mask.any():
+                logger.debug("De-donut complete. No donut detected")
+                mask_modified.fill(False)
+                return mask_modified
+            self._expand(donut_mask, self.single_config.exp_donut, mask_modified)
+            mask_modified &= mask_modifiable
+            np.copyto(img, 0, where=mask_modified)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"De-donut complete. Modified pixels: {np.count_nonzero(mask_modified)}")
+            return mask_modified
         except Exception as e:
             logger.error(f"De-donut failed: {e}")
             raise
     
-    def _de_streak(self, img_orig: np.ndarray, mask_modifiable: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
-        """Remove streak-shaped features using convolution-based detection and morphological expansion."""
+    def _de_streak(self, img: np.ndarray, mask_modifiable: np.ndarray, out: np.ndarray | None = None) -> np.ndarray:
+        """Remove streak-shaped features in place using convolution-based detection and morphological expansion, returning the modified mask."""
         try:
-            if self.single_config is None:
-                raise ValueError("Configuration is not set")
-            if not isinstance(img_orig, np.ndarray) or not isinstance(mask_modifiable, np.ndarray):
-                raise TypeError("Input image and mask must be numpy arrays")
-            if img_orig.shape != mask_modifiable.shape:
-                raise ValueError(f"Image shape {img_orig.shape} does not match mask shape {mask_modifiable.shape}")
-            
             logger.debug(f"Starting de-streak with threshold: {self.single_config.th_streak} and window size: {self.single_config.win_streak}")
 
-            img_orig_copy = np.copy(img_orig)
-            mask_modifiable_copy = np.copy(mask_modifiable)
-            
-            img_binary = (img_orig_copy > 0).astype(np.int32)
-            img_binary = img_binary * mask_modifiable_copy
-            conv_kernel = np.ones((self.single_config.win_streak, self.single_config.win_streak), dtype=self.dtype)
-            img_conv = convolve(img_binary, conv_kernel, mode='constant', cval=0)
-            img_conv = img_conv * img_binary
-            streak_mask = img_conv >= self.single_config.th_streak
-            streak_mask_expanded = maximum_filter(streak_mask, size=self.single_config.exp_streak)
-            mask_modified = streak_mask_expanded & mask_modifiable_copy
-            img_orig_copy[mask_modified] = 0
-            logger.debug(f"De-streak complete. Modified pixels: {np.sum(mask_modified)}")
-            return img_orig_copy, mask_modified
+            img_binary = np.greater(img, 0, out=self._buffer('img_binary', np.uint8, img.shape))
+            np.multiply(img_binary, mask_modifiable, out=img_binary)
+            img_conv = self._box_sum(img_binary, self._buffer('img_conv', np.uint16, img.shape))
+            np.multiply(img_conv, img_binary, out=img_conv)
+            streak_mask = np.greater_equal(img_conv, self.single_config.th_streak, out=self._buffer('mask_detected', bool, img.shape))
+            mask_modified = np.empty(img.shape, dtype=bool) if out is None else out
+            if not streak_mask.any():
+                logger.debug("De-streak complete. No streak detected")
+                mask_modified.fill(False)
+                return mask_modified
+            self._expand(streak_mask, self.single_config.exp_streak, mask_modified)
+            mask_modified &= mask_modifiable
+            np.copyto(img, 0, where=mask_modified)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"De-streak complete. Modified pixels: {np.count_nonzero(mask_modified)}")
+            return mask_modified
         except Exception as e:
             logger.error(f"De-streak failed: {e}")
             raise
 
     # Public Methods
     
-    def clean_img(self) -> SingleResult:
-        """Clean the image by sequentially removing donut-shaped and streak-shaped features."""
+    def reset(self, img_orig: np.ndarray) -> None:
+        """Point the processor at another image (or stack of images) with the same frame shape.
+
+        The configuration, mask, buffers and tile plan are kept, so a series can be cleaned batch by batch with one processor.
+        """
+        try:
+            self._set_img(img_orig, self.single_result.mask_modifiable)
+        except Exception as e:
+            logger.error(f"Failed to reset SingleProcessor: {e}")
+            raise
+
+    def clean_img(self, copy: bool = False) -> SingleResult:
+        """Clean the image by sequentially removing donut-shaped and streak-shaped features.
+
+        The returned result shares its arrays with the processor; pass copy=True to get independent arrays.
+        """
         try:
-            if self.single_result.img_orig is None or self.single_result.mask_modifiable is None:
-                raise ValueError("Image and mask must be set before cleaning")
-            
             logger.debug("Starting image cleaning process")
 
-            self.single_result.img_half_clean, self.single_result.mask_donut = self._de_donut(self.single_result.img_orig, self.single_result.mask_modifiable)
-            self.single_result.img_clean, self.single_result.mask_streak = self._de_streak(self.single_result.img_half_clean, self.single_result.mask_modifiable)
+            if len(self.tiles) == 1 and self.tiles[0][0] == (slice(0, self.shape[-2]), slice(0, self.shape[-1])):
+                self.single_result.img_half_clean = self._buffer('img_half_clean', self.dtype)
+                np.copyto(self.single_result.img_half_clean, self.single_result.img_orig)
+                self.single_result.mask_donut = self._de_donut(self.single_result.img_half_clean, self.single_result.mask_modifiable, out=self._buffer('mask_donut', bool))
+                self.single_result.img_clean = self._buffer('img_clean', self.dtype)
+                np.copyto(self.single_result.img_clean, self.single_result.img_half_clean)
+                self.single_result.mask_streak = self._de_streak(self.single_result.img_clean, self.single_result.mask_modifiable, out=self._buffer('mask_streak', bool))
+            else:
+                (self.single_result.img_half_clean, self.single_result.mask_donut,
+                 self.single_result.img_clean, self.single_result.mask_streak) = self._clean_tiled(self.single_result.img_orig, self.single_result.mask_modifiable)
             
-            self.single_result.mask_combined = self.single_result.mask_donut | self.single_result.mask_streak
-            self.single_result.sub_donut = self.single_result.img_orig - self.single_result.img_half_clean
-            self.single_result.sub_streak = self.single_result.img_half_clean - self.single_result.img_clean
+            self.single_result.mask_combined = np.logical_or(self.single_result.mask_donut, self.single_result.mask_streak, out=self._buffer('mask_combined', bool))
+            # The passes only zero the masked pixels, so the removed parts are the masked inputs
+            self.single_result.sub_donut = np.multiply(self.single_result.img_orig, self.single_result.mask_donut, out=self._buffer('sub_donut', self.dtype))
+            self.single_result.sub_streak = np.multiply(self.single_result.img_half_clean, self.single_result.mask_streak, out=self._buffer('sub_streak', self.dtype))
             
             logger.debug("Image cleaning process completed successfully")
-            return deepcopy(self.single_result)
+            if copy:
+                return SingleResult(**{
+                    key: None if value is None else value.copy()
+                    for key, value in self.single_result.__dict__.items()
+                })
+            return replace(self.single_result)
         except Exception as e:
             logger.error(f"Image cleaning failed: {e}")
             raise
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""Tests for the image series implementations and wrappers."""
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+from saxs_decosmic.core.image_series import ImageSeries, ManualImageSeries, StackedMemmapImageSeries
+
+NFRAMES, HEIGHT, WIDTH = 7, 5, 6
+
+@pytest.fixture
+def frames() -> np.ndarray:
+    """Frames with distinct values, so a frame can be told apart from its neighbours."""
+    return np.arange(NFRAMES * HEIGHT * WIDTH, dtype=np.int32).reshape(NFRAMES, HEIGHT, WIDTH)
+
+@pytest.fixture
+def series_dir(tmp_path, frames) -> str:
+    """Directory holding one TIFF file per frame."""
+    for index, frame in enumerate(frames):
+        tifffile.imwrite(tmp_path / f'f_{index:04d}.tif', frame)
+    return str(tmp_path)
+
+# Lazy Stack Indexing
+
+@pytest.mark.parametrize('key', [
+    3,
+    -1,
+    slice(1, 5, 2),
+    [4, 0, 2],
+    np.arange(NFRAMES) % 2 == 0,
+    (2, 1),
+    (slice(None), 1, slice(2, 4)),
+    Ellipsis,
+    (Ellipsis, 3),
+    (Ellipsis, 1, 3),
+    (Ellipsis, 2, 1, 3),
+    (2, Ellipsis),
+])
+def test_lazy_stack_indexing_matches_numpy(series_dir, frames, key):
+    stack = ManualImageSeries(series_dir).as_array()
+    np.testing.assert_array_equal(stack[key], frames[key])
+
+@pytest.mark.parametrize('key', [None, (None, 1), (0, None), (Ellipsis, None)])
+def test_lazy_stack_rejects_new_axes(series_dir, key):
+    stack = ManualImageSeries(series_dir).as_array()
+    with pytest.raises(IndexError):
+        stack[key]
+
+# Stacked Memory-Mapped Reads
+
+@pytest.mark.parametrize('byteorder', ['<', '>'])
+def test_stacked_series_reads_frames_in_native_order(tmp_path, frames, byteorder):
+    filename = str(tmp_path / 'stack.tif')
+    tifffile.imwrite(filename, frames, byteorder=byteorder)
+    img_series = StackedMemmapImageSeries(filename)
+    try:
+        for index in range(NFRAMES):
+            frame = img_series.get_frame(index)
+            assert frame.dtype.isnative
+            np.testing.assert_array_equal(frame, frames[index])
+        for index in (-1, NFRAMES):
+            with pytest.raises(IndexError):
+                img_series.get_frame(index)
+    finally:
+        img_series.cleanup()
+
+# Fabio Sequential Reads
+
+@pytest.mark.parametrize('order', [[0, 1, 20, 2], [0, 1, 2, 3], [5, 0, 1, 2], [0, 21, 22, 0, 1], [24, 23, 0, 1]])
+def test_fabio_series_reads_requested_frames(tmp_path, order):
+    pytest.importorskip('fabio')
+    for index in range(25):
+        tifffile.imwrite(tmp_path / f'img_{index:04d}.tif', np.full((4, 4), index, dtype=np.int32))
+    img_series = ImageSeries.create(str(tmp_path / 'img_0000.tif'), use_fabio=True)
+    try:
+        assert [int(img_series.get_frame(index)[0, 0]) for index in order] == order
+    finally:
+        img_series.cleanup()
+
+def test_fabio_series_through_wrappers(tmp_path):
+    pytest.importorskip('fabio')
+    for index in range(5):
+        tifffile.imwrite(tmp_path / f'img_{index:04d}.tif', np.full((4, 4), index, dtype=np.int32))
+    img_series = ImageSeries.create(str(tmp_path / 'img_0000.tif'), use_fabio=True, prefetch=2, cache_bytes=1 << 20)
+    try:
+        assert img_series.nframes == 5
+        assert [int(img_series.get_frame(index)[0, 0]) for index in range(5)] == list(range(5))
+    finally:
+        img_series.cleanup()
+
+def test_fabio_series_resumes_sequential_reads_at_any_index(tmp_path):
+    pytest.importorskip('fabio')
+    for index in range(25):
+        tifffile.imwrite(tmp_path / f'img_{index:04d}.tif', np.full((4, 4), index, dtype=np.int32))
+    img_series = ImageSeries.create(str(tmp_path / 'img_0000.tif'), use_fabio=True)
+    random_reads = []
+    get_frame = img_series.img_series.get_frame
+    img_series.img_series.get_frame = lambda index: random_reads.append(index) or get_frame(index)
+    try:
+        assert [int(img_series.get_frame(index)[0, 0]) for index in range(10, 25)] == list(range(10, 25))
+        assert random_reads == [10]
+    finally:
+        img_series.cleanup()
+
+@pytest.mark.parametrize('order', [list(range(9)), [4, 5, 6, 7], [7, 1, 2, 3, 8]])
+def test_fabio_series_reads_multi_frame_files(tmp_path, order):
+    pytest.importorskip('fabio')
+    for index in range(3):
+        with tifffile.TiffWriter(tmp_path / f'img_{index:04d}.tif') as tif:
+            for value in range(3 * index, 3 * index + 3):
+                tif.write(np.full((4, 4), value, dtype=np.int32)) # One page per frame, as fabio reads them
+    img_series = ImageSeries.create(str(tmp_path / 'img_0000.tif'), use_fabio=True)
+    try:
+        assert img_series.nframes == 9
+        assert img_series.frame_source(0) is None
+        assert [int(img_series.get_frame(index)[0, 0]) for index in order] == order
+    finally:
+        img_series.cleanup()
+
+# Memory Cache Tier
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='needs /proc/self/fd to count open files')
+def test_memory_cache_keeps_no_files_open(tmp_path, tmp_path_factory):
+    for index in range(200):
+        tifffile.imwrite(tmp_path / f'f_{index:04d}.tif', np.full((HEIGHT, WIDTH), index, dtype=np.int32))
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    for _ in range(2): # Read from the files, then from the disk tier
+        open_files = len(os.listdir('/proc/self/fd'))
+        img_series = ImageSeries.create(str(tmp_path), cache_bytes=1 << 30, cache_dir=cache_dir)
+        try:
+            img_series.get_frames(range(200))
+            assert img_series.cache_info().nframes == 200
+            assert len(os.listdir('/proc/self/fd')) < open_files + 10
+        finally:
+            img_series.cleanup()
+
+# Disk Cache Tier
+
+def test_disk_cache_rereads_rewritten_frame(series_dir, frames, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    img_series = ImageSeries.create(series_dir, cache_bytes=1, cache_dir=cache_dir)
+    img_series.get_frames(range(NFRAMES))
+    img_series.cleanup()
+
+    rewritten = f'{series_dir}/f_0005.tif'
+    tifffile.imwrite(rewritten, np.full((HEIGHT, WIDTH), 7, dtype=np.int32))
+    stat = os.stat(rewritten)
+    os.utime(rewritten, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)) # Distinct even on coarse-mtime filesystems
+
+    img_series = ImageSeries.create(series_dir, cache_bytes=1, cache_dir=cache_dir)
+    try:
+        np.testing.assert_array_equal(img_series.get_frame(5), 7)
+        np.testing.assert_array_equal(img_series.get_frame(4), frames[4])
+        assert img_series.cache_info().disk_hits == 1
+    finally:
+        img_series.cleanup()
+
+def test_disk_cache_stays_within_budget(series_dir, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    budget = 3 * (HEIGHT * WIDTH * 4 + 128)
+    img_series = ImageSeries.create(series_dir, cache_bytes=1, cache_dir=cache_dir, cache_dir_bytes=budget)
+    img_series.get_frames(range(NFRAMES))
+    img_series.cleanup()
+
+    sizes = [entry.stat().st_size for entry in os.scandir(os.path.join(cache_dir, 'tifffile'))]
+    assert 0 < len(sizes) < NFRAMES
+    assert sum(sizes) <= budget
+
+def test_disk_cache_stats_each_source_file_once(tmp_path, frames, monkeypatch):
+    filename = str(tmp_path / 'stack.tif')
+    tifffile.imwrite(filename, frames)
+    img_series = ImageSeries.create(filename, cache_bytes=1, cache_dir=str(tmp_path / 'cache'))
+    stats = []
+    stat = os.stat
+    monkeypatch.setattr(os, 'stat', lambda path, *args, **kwargs: stats.append(path) or stat(path, *args, **kwargs))
+    try:
+        for _ in range(2):
+            img_series.get_frames(range(NFRAMES))
+        assert stats.count(filename) == 1
+    finally:
+        monkeypatch.undo()
+        img_series.cleanup()
+
+def test_disk_cache_without_spill_only_reads(series_dir, frames, tmp_path_factory):
+    cache_dir = str(tmp_path_factory.mktemp('cache'))
+    img_series = ImageSeries.create(series_dir, cache_dir=cache_dir)
+    img_series.get_frames(range(3))
+    img_series.cleanup()
+    spilled = sorted(os.listdir(os.path.join(cache_dir, 'tifffile')))
+
+    img_series = ImageSeries.create(series_dir, cache_dir=cache_dir, cache_spill=False)
+    try:
+        np.testing.assert_array_equal(img_series.get_frames(range(NFRAMES)), frames)
+        assert img_series.cache_info().disk_hits == 3
+    finally:
+        img_series.cleanup()
+    assert sorted(os.listdir(os.path.join(cache_dir, 'tifffile'))) == spilled
@@ -0,0 +1,134 @@
+"""Tests for SeriesProcessor against a straightforward frame-by-frame numpy computation of its results."""
+from contextlib import contextmanager
+import os
+
+import numpy as np
+import pytest
+import tifffile
+
+from saxs_decosmic.core.series_processor import SeriesConfig, SeriesProcessor, SeriesResult
+from saxs_decosmic.core.single_processor import SingleConfig, SingleProcessor
+
+NFRAMES, HEIGHT, WIDTH = 11, 40, 48
+
+@pytest.fixture(params=[np.int32, np.float32])
+def first_filename(request, tmp_path) -> str:
+    """Series of one TIFF per frame with a ring, cosmic spots, streaks and outlier values."""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[:HEIGHT, :WIDTH]
+    ring = np.abs(np.hypot(yy - HEIGHT / 2, xx - WIDTH / 2) - 12) < 2
+    for index in range(NFRAMES):
+        img = rng.poisson(0.05 + 3.0 * ring).astype(request.param)
+        for _ in range(3):
+            y, x = rng.integers(1, HEIGHT - 1), rng.integers(1, WIDTH - 1)
+            img[y - 1:y + 2, x - 1:x + 2] += rng.integers(20, 60)
+        y, x = rng.integers(0, HEIGHT), rng.integers(0, WIDTH - 12)
+        img[y, x:x + 12] += 1
+        if index == 5:
+            img[3, 3] = 20000
+        if request.param == np.float32 and index == 7:
+            img[4, 4], img[6, 6] = np.nan, -3
+        tifffile.imwrite(tmp_path / f'img_{index:04d}.tif', img)
+    return str(tmp_path / 'img_0000.tif')
+
+@pytest.fixture
+def mask_modifiable() -> np.ndarray:
+    """User mask protecting a corner."""
+    mask = np.ones((HEIGHT, WIDTH), dtype=bool)
+    mask[:6, :6] = False
+    return mask
+
+def series_config(**kwargs) -> SeriesConfig:
+    """Get the test configuration with the given processing options."""
+    return SeriesConfig(th_donut=15, th_streak=3, win_streak=3, exp_donut=9, exp_streak=3, th_mask=0.1, progress=False, **kwargs)
+
+def reference(first_filename: str, config: SeriesConfig, mask_modifiable: np.ndarray) -> dict:
+    """Compute the series results frame by frame with untiled SingleProcessor runs and plain numpy reductions."""
+    directory = first_filename.rsplit('/', 1)[0]
+    imgs = np.stack([tifffile.imread(f'{directory}/img_{index:04d}.tif') for index in range(NFRAMES)])
+    imgs = np.fmax(np.where(imgs > 10000, 0, imgs), 0)
+    avg_binary = (imgs > 0).mean(axis=0)
+    mask = (avg_binary <= config.th_mask) & mask_modifiable
+    single_config = SingleConfig(config.th_donut, config.th_streak, config.win_streak, config.exp_donut, config.exp_streak)
+    results = [SingleProcessor(img.copy(), single_config, mask).clean_img(copy=True) for img in imgs]
+    half_clean = np.stack([result.img_half_clean for result in results]).astype(np.float64)
+    clean = np.stack([result.img_clean for result in results]).astype(np.float64)
+    num_half_clean = NFRAMES - np.sum([result.mask_donut for result in results], axis=0)
+    num_clean = NFRAMES - np.sum([result.mask_combined for result in results], axis=0)
+    avg_half_clean = np.divide(half_clean.sum(axis=0), num_half_clean, out=np.zeros((HEIGHT, WIDTH)), where=num_half_clean != 0)
+    avg_clean = np.divide(clean.sum(axis=0), num_clean, out=np.zeros((HEIGHT, WIDTH)), where=num_clean != 0)
+    avg_direct = imgs.astype(np.float64).mean(axis=0)
+    return {
+        'avg_direct': avg_direct,
+        'avg_binary': avg_binary,
+        'mask_modifiable': mask,
+        'var_direct': ((imgs - avg_direct) ** 2).mean(axis=0),
+        'avg_half_clean': avg_half_clean,
+        'avg_clean': avg_clean,
+        'avg_donut': np.mean([result.sub_donut for result in results], axis=0, dtype=np.float64),
+        'avg_streak': np.mean([result.sub_streak for result in results], axis=0, dtype=np.float64),
+        'var_half_clean': ((half_clean - avg_half_clean) ** 2).mean(axis=0),
+        'var_clean': ((clean - avg_clean) ** 2).mean(axis=0),
+    }
+
+def assert_matches_reference(first_filename: str, mask_modifiable: np.ndarray, **kwargs) -> SeriesResult:
+    """Process the series with the given options, compare every result with the reference and return the results."""
+    config = series_config(**kwargs)
+    processor = SeriesProcessor(first_filename, config, mask_modifiable.copy())
+    try:
+        result = processor.process_series()
+    finally:
+        processor.cleanup()
+    for key, expected in reference(first_filename, config, mask_modifiable).items():
+        np.testing.assert_allclose(getattr(result, key), expected, rtol=1e-9, atol=1e-9, err_msg=key)
+    return result
+
+# Batched Cleaning
+
+@pytest.mark.parametrize('batch_size', [1, 4, 16])
+def test_batched_series_matches_reference(first_filename, mask_modifiable, batch_size):
+    assert_matches_reference(first_filename, mask_modifiable, batch_size=batch_size)
+
+def test_batch_bytes_caps_batch_size(first_filename, mask_modifiable):
+    frame_bytes = HEIGHT * WIDTH * 4
+    processor = SeriesProcessor(first_filename, series_config(batch_size=16, batch_bytes=3 * frame_bytes + 1), mask_modifiable)
+    try:
+        assert processor.batch_size == 3
+    finally:
+        processor.cleanup()
+    assert_matches_reference(first_filename, mask_modifiable, batch_size=16, batch_bytes=1)
+
+# Merged Variances
+
+@pytest.mark.parametrize('batch_size, n_workers', [(1, 1), (3, 1), (4, 1), (5, 2), (3, 3), (16, 2)])
+def test_variances_match_reference(first_filename, mask_modifiable, batch_size, n_workers):
+    result = assert_matches_reference(first_filename, mask_modifiable, batch_size=batch_size, n_workers=n_workers)
+    for key in ('var_direct', 'var_half_clean', 'var_clean'):
+        assert np.any(getattr(result, key) > 0), key
+
+# Tiled Cleaning
+
+@pytest.mark.parametrize('tile_size', [5, 16])
+def test_tiled_series_matches_reference(first_filename, mask_modifiable, tile_size):
+    assert_matches_reference(first_filename, mask_modifiable, batch_size=4, tile_size=tile_size)
+
+# Memory-Mapped Accumulators
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc/self/maps to list mapped files')
+def test_memory_mapped_accumulators_are_unmapped_before_removal(first_filename, mask_modifiable, tmp_path_factory, monkeypatch):
+    accumulator_dir = str(tmp_path_factory.mktemp('accumulators'))
+    accumulator_dir_of = SeriesProcessor._accumulator_dir
+
+    @contextmanager
+    def checked_accumulator_dir(self):
+        # Removing a directory of mapped files fails on Windows, so nothing may be mapped from it by then
+        with accumulator_dir_of(self) as workdir:
+            yield workdir
+            with open('/proc/self/maps') as maps:
+                assert workdir not in maps.read()
+
+    monkeypatch.setattr(SeriesProcessor, '_accumulator_dir', checked_accumulator_dir)
+    result = assert_matches_reference(first_filename, mask_modifiable, batch_size=4, accumulator_dir=accumulator_dir)
+    assert os.listdir(accumulator_dir) == []
+    for key, value in result.__dict__.items():
+        assert not isinstance(value, np.memmap), key
@@ -0,0 +1,59 @@
+"""Tests for the batched and tiled cleaning of SingleProcessor against plain single-frame cleaning."""
+import numpy as np
+import pytest
+
+from saxs_decosmic.core.single_processor import SingleBuffers, SingleConfig, SingleProcessor
+
+NFRAMES, HEIGHT, WIDTH = 5, 40, 48
+RESULT_KEYS = ('img_half_clean', 'img_clean', 'mask_donut', 'mask_streak', 'mask_combined', 'sub_donut', 'sub_streak')
+
+@pytest.fixture
+def imgs() -> np.ndarray:
+    """Frames of sparse counts with cosmic spots and a streak each."""
+    rng = np.random.default_rng(0)
+    imgs = rng.poisson(0.05, size=(NFRAMES, HEIGHT, WIDTH)).astype(np.int32)
+    for img in imgs:
+        for _ in range(3):
+            y, x = rng.integers(1, HEIGHT - 1), rng.integers(1, WIDTH - 1)
+            img[y - 1:y + 2, x - 1:x + 2] += rng.integers(20, 60)
+        y, x = rng.integers(0, HEIGHT), rng.integers(0, WIDTH - 12)
+        img[y, x:x + 12] += 1
+    return imgs
+
+@pytest.fixture
+def mask_modifiable() -> np.ndarray:
+    """Mask protecting a block and a border, so that tiles are planned over part of the image only."""
+    mask = np.ones((HEIGHT, WIDTH), dtype=bool)
+    mask[10:20, 15:30] = False
+    mask[:, :3] = False
+    return mask
+
+def clean_frames(imgs: np.ndarray, single_config: SingleConfig, mask_modifiable: np.ndarray) -> dict:
+    """Clean each frame on its own with a fresh processor and stack the results."""
+    results = [SingleProcessor(img.copy(), single_config, mask_modifiable).clean_img(copy=True) for img in imgs]
+    return {key: np.stack([getattr(result, key) for result in results]) for key in RESULT_KEYS}
+
+@pytest.mark.parametrize('win_streak, exp_donut, exp_streak', [(3, 9, 3), (5, 5, 5)])
+def test_batched_cleaning_matches_single_frames(imgs, mask_modifiable, win_streak, exp_donut, exp_streak):
+    single_config = SingleConfig(15, 3, win_streak, exp_donut, exp_streak)
+    expected = clean_frames(imgs, single_config, mask_modifiable)
+    buffers = SingleBuffers.allocate((3, HEIGHT, WIDTH), imgs.dtype)
+    processor = SingleProcessor(imgs[:3], single_config, mask_modifiable, buffers)
+    for start in (0, 3): # A full batch, then a shorter one in the same buffers
+        processor.reset(imgs[start:start + 3])
+        result = processor.clean_img()
+        for key in RESULT_KEYS:
+            np.testing.assert_array_equal(getattr(result, key), expected[key][start:start + 3], err_msg=key)
+
+@pytest.mark.parametrize('tile_size', [1, 7, 16, 100])
+@pytest.mark.parametrize('batched', [False, True])
+def test_tiled_cleaning_matches_untiled(imgs, mask_modifiable, tile_size, batched):
+    expected = clean_frames(imgs, SingleConfig(15, 3, 3, 9, 3), mask_modifiable)
+    tiled_config = SingleConfig(15, 3, 3, 9, 3, tile_size=tile_size)
+    if batched:
+        result = SingleProcessor(imgs.copy(), tiled_config, mask_modifiable).clean_img()
+        actual = {key: getattr(result, key) for key in RESULT_KEYS}
+    else:
+        actual = clean_frames(imgs, tiled_config, mask_modifiable)
+    for key in RESULT_KEYS:
+        np.testing.assert_array_equal(actual[key], expected[key], err_msg=key)